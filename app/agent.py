@@ -3,6 +3,7 @@ import json
 import requests
 from app.settings import settings
 from app.knowledge_base import load_kb
+from app.metrics import traced
 
 SYSTEM_PROMPT = """
 Sos un asistente oficial de la Subsecretaría de Capacitación.
@@ -52,7 +53,7 @@ def openai_chat(user_text: str, history: list[dict]) -> str:
             + [{"role": "user", "content": user_text}]
         ),
     }
-    r = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, data=json.dumps(payload), timeout=60)
+    r = requests.post(f"{settings.OPENAI_BASE_URL}/chat/completions", headers=headers, data=json.dumps(payload), timeout=60)
     r.raise_for_status()
     return r.json()["choices"][0]["message"]["content"].strip()
 
@@ -64,7 +65,7 @@ def gemini_chat(user_text: str, history: list[dict]) -> str:
     Docs: https://ai.google.dev/api/generate-content
     """
     url = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/"
+        f"{settings.GEMINI_BASE_URL}/models/"
         f"{settings.GEMINI_MODEL}:generateContent?key={settings.GEMINI_API_KEY}"
     )
 
@@ -97,6 +98,7 @@ def gemini_chat(user_text: str, history: list[dict]) -> str:
     except (KeyError, IndexError):
         return "No pude generar una respuesta. Intentá de nuevo."
 
+@traced("chat")
 def chat(user_text: str, history: list[dict]) -> str:
     provider = settings.AI_PROVIDER
 
@@ -2,7 +2,9 @@
 
 # app/audio.py
 from pathlib import Path
+from app.metrics import traced
 
+@traced("transcribe_audio_local")
 def transcribe_audio_local(audio_path: str) -> str:
     try:
         from faster_whisper import WhisperModel
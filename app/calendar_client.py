@@ -1,19 +1,25 @@
 # app/calendar_client.py
 from datetime import datetime, timedelta
 from dateutil import tz
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from app.settings import settings
+from app.metrics import traced
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
 def get_service():
+    if settings.GOOGLE_CALENDAR_API_URL:
+        return build("calendar", "v3", credentials=AnonymousCredentials(), cache_discovery=False,
+                     client_options={"api_endpoint": settings.GOOGLE_CALENDAR_API_URL})
     creds = service_account.Credentials.from_service_account_file(
         settings.GOOGLE_SERVICE_ACCOUNT_FILE,
         scopes=SCOPES
     )
     return build("calendar", "v3", credentials=creds, cache_discovery=False)
 
+@traced("is_busy")
 def is_busy(start_dt: datetime, end_dt: datetime) -> bool:
     service = get_service()
     body = {
@@ -26,6 +32,7 @@ def is_busy(start_dt: datetime, end_dt: datetime) -> bool:
     busy = fb["calendars"][settings.GOOGLE_CALENDAR_ID].get("busy", [])
     return len(busy) > 0
 
+@traced("create_event")
 def create_event(summary: str, description: str, start_dt: datetime, end_dt: datetime, attendee_phone: str):
     service = get_service()
     event = {
@@ -35,4 +42,9 @@ def create_event(summary: str, description: str, start_dt: datetime, end_dt: dat
         "end": {"dateTime": end_dt.isoformat(), "timeZone": settings.TIMEZONE},
     }
     created = service.events().insert(calendarId=settings.GOOGLE_CALENDAR_ID, body=event).execute()
-    return created.get("id"), created.get("htmlLink")
\ No newline at end of file
+    return created.get("id"), created.get("htmlLink")
+
+@traced("delete_event")
+def delete_event(event_id: str):
+    service = get_service()
+    service.events().delete(calendarId=settings.GOOGLE_CALENDAR_ID, eventId=event_id).execute()
@@ -1,94 +1,79 @@
-import sqlite3
-from pathlib import Path
-from datetime import datetime
-from typing import Optional, Dict, Any
+# app/db.py
+from app.storage import Storage, make_storage
+from app.metrics import traced
 
-DB_PATH=Path('bot_sqlite3')
+_storage: Storage | None = None
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        _storage = make_storage()
+    return _storage
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        phone VARCHAR PRIMARY KEY,
-        name VARCHAR(20),
-        last_seen TEXT,
-        state TEXT DEFAULT 'idle',
-        context_json TEXT DEFAULT '{}'
-    );
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        phone VARCHAR(15),
-        direction TEXT, -- in/out
-        text TEXT,
-        ts TEXT
-    );
-    """)
-
-    conn.commit()
-    conn.close()
+def set_storage(storage: Storage):
+    """Reemplaza el backend activo (tests / benchmarks)."""
+    global _storage
+    _storage = storage
 
+def init_db():
+    get_storage().init()
 
+@traced("upsert_user")
 def upsert_user(phone: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    now = datetime.utcnow().isoformat()
-    cur.execute("""
-    INSERT INTO users(phone, last_seen) VALUES(?, ?)
-    ON CONFLICT(phone) DO UPDATE SET last_seen=excluded.last_seen;
-    """, (phone, now))
-    conn.commit()
-    conn.close()
+    get_storage().upsert_user(phone)
 
+@traced("set_state")
 def set_state(phone: str, state: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE users SET state=? WHERE phone=?", (state, phone))
-    conn.commit()
-    conn.close()
+    get_storage().set_state(phone, state)
 
+@traced("get_state")
 def get_state(phone: str) -> str:
-    conn = get_conn()
-    cur = conn.cursor()
-    row = cur.execute("SELECT state FROM users WHERE phone=?", (phone,)).fetchone()
-    conn.close()
-    return row["state"] if row else "idle"
+    return get_storage().get_state(phone)
 
+@traced("log_message")
 def log_message(phone: str, direction: str, text: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO messages(phone, direction, text, ts) VALUES(?,?,?,datetime('now'))",
-                (phone, direction, text))
-    conn.commit()
-    conn.close()
-
-
-# app/db.py (agregar)
-import json
+    get_storage().log_message(phone, direction, text)
 
+@traced("get_context")
 def get_context(phone: str) -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    row = cur.execute("SELECT context_json FROM users WHERE phone=?", (phone,)).fetchone()
-    conn.close()
-    if not row:
-        return {}
-    try:
-        return json.loads(row["context_json"] or "{}")
-    except:
-        return {}
+    return get_storage().get_context(phone)
 
+@traced("set_context")
 def set_context(phone: str, ctx: dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE users SET context_json=? WHERE phone=?",
-                (json.dumps(ctx, ensure_ascii=False), phone))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    get_storage().set_context(phone, ctx)
+
+@traced("add_booking")
+def add_booking(phone: str, event_id: str, start_ts: str) -> str:
+    return get_storage().add_booking(phone, event_id, start_ts)
+
+@traced("due_reminders")
+def due_reminders(start_from: str, start_to: str, after: str, limit: int, min_notice_seconds: int = 0) -> list[dict]:
+    return get_storage().due_reminders(start_from, start_to, after, limit, min_notice_seconds)
+
+@traced("claim_reminder")
+def claim_reminder(booking_id: str) -> bool:
+    return get_storage().claim_reminder(booking_id)
+
+@traced("unclaim_reminder")
+def unclaim_reminder(booking_id: str):
+    get_storage().unclaim_reminder(booking_id)
+
+@traced("pending_reply")
+def pending_reply(phone: str, now_ts: str) -> dict | None:
+    return get_storage().pending_reply(phone, now_ts)
+
+@traced("set_booking_status")
+def set_booking_status(booking_id: str, status: str):
+    get_storage().set_booking_status(booking_id, status)
+
+@traced("get_cursor")
+def get_cursor(name: str) -> str | None:
+    return get_storage().get_cursor(name)
+
+@traced("set_cursor")
+def set_cursor(name: str, value: str | None):
+    get_storage().set_cursor(name, value)
+
+@traced("acquire_lease")
+def acquire_lease(name: str, owner: str, ttl_seconds: float) -> bool:
+    return get_storage().acquire_lease(name, owner, ttl_seconds)
@@ -1,10 +1,15 @@
 #flujo de turnos
 # app/flows.py
 import re
+import logging
 from datetime import datetime, timedelta
 from dateutil import tz, parser
 from app.settings import settings
 from app import calendar_client
+from app.db import add_booking
+from app.storage import to_utc_ts
+
+log = logging.getLogger(__name__)
 
 # ---------- MENÚ ----------
 def is_greeting(text: str) -> bool:
@@ -72,6 +77,13 @@ def format_dt(dt: datetime) -> str:
 def offer_alternatives(dt: datetime, duration: timedelta):
     return [dt + duration, dt + duration*2]
 
+def record_booking(phone: str, event_id: str, dt: datetime):
+    """Guarda el turno para los recordatorios. El evento ya existe: si falla, se confirma igual."""
+    try:
+        add_booking(phone, event_id, to_utc_ts(dt))
+    except Exception:
+        log.exception("No se pudo guardar el turno %s (queda sin recordatorio)", event_id)
+
 def try_book_slot(phone: str, user_text: str):
     dt = parse_datetime_es(user_text)
     if not dt:
@@ -106,6 +118,7 @@ def try_book_slot(phone: str, user_text: str):
         end_dt=end_dt,
         attendee_phone=phone
     )
+    record_booking(phone, event_id, dt)
     return (True,
             f"✅ Turno confirmado:\n"
             f"📅 {dt.strftime('%d/%m/%Y')} a las {dt.strftime('%H:%M')} (duración {settings.DEFAULT_SLOT_MINUTES} min)\n"
@@ -117,13 +130,14 @@ def book_from_alternatives(phone: str, alt_dt: datetime):
         return (False, "Ese horario alternativo no está dentro del horario de atención. Enviame otro día/hora.")
     if calendar_client.is_busy(alt_dt, alt_dt + duration):
         return (False, "Ese horario alternativo se ocupó recién. Enviame otro día/hora.")
-    calendar_client.create_event(
+    event_id, _ = calendar_client.create_event(
         summary="Turno - Subsecretaría de Capacitación",
         description="Atención presencial para información / trámites.",
         start_dt=alt_dt,
         end_dt=alt_dt + duration,
         attendee_phone=phone
     )
+    record_booking(phone, event_id, alt_dt)
     return (True,
             f"✅ Turno confirmado:\n"
             f"📅 {alt_dt.strftime('%d/%m/%Y')} a las {alt_dt.strftime('%H:%M')} (duración {settings.DEFAULT_SLOT_MINUTES} min)\n"
@@ -1,6 +1,8 @@
 # app/main.py
 import os
 import hmac
+import asyncio
+import logging
 import hashlib
 
 from fastapi import FastAPI, Request, Response, Depends, Header, HTTPException
@@ -15,6 +17,8 @@ from app.db import (
 from app.wa_client import send_text, get_media_url, download_media
 from app.audio import transcribe_audio_local
 from app.agent import chat
+from app.reminders import run_scheduler, handle_reminder_reply
+from app.metrics import span, set_branch, request_trace, render as render_metrics
 from app.flows import (
     is_greeting, menu_text, menu_choice,
     looks_like_booking, try_book_slot,
@@ -23,6 +27,7 @@ from app.flows import (
 
 # --------- APP ---------
 app = FastAPI()
+log = logging.getLogger(__name__)
 
 # --------- DEPENDENCIAS ---------
 def verify_test_key(x_test_api_key: str = Header(default="")):
@@ -92,9 +97,19 @@ def _handle_booking_result(phone: str, result):
 
 
 # --------- STARTUP ---------
+_reminder_task: asyncio.Task | None = None
+
 @app.on_event("startup")
-def _startup():
+async def _startup():
+    global _reminder_task
     init_db()
+    if settings.REMINDERS_ENABLED:
+        _reminder_task = asyncio.create_task(run_scheduler())
+
+@app.on_event("shutdown")
+async def _shutdown():
+    if _reminder_task:
+        _reminder_task.cancel()
 
 @app.get("/webhook")
 async def verify_webhook(request: Request):
@@ -107,18 +122,30 @@ async def verify_webhook(request: Request):
         return Response(content=challenge, media_type="text/plain")
     return Response(content="Invalid token", status_code=403)
 
+@app.get("/metrics")
+async def metrics():
+    """Histogramas por etapa y por request en formato texto de Prometheus."""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/webhook")
 async def webhook(request: Request):
+    with request_trace("webhook"):
+        return await _process_webhook(request)
+
+async def _process_webhook(request: Request):
     # -------- validación HMAC-SHA256 (Meta X-Hub-Signature-256) --------
     if settings.WA_APP_SECRET:
         sig_header = request.headers.get("X-Hub-Signature-256", "")
         body_bytes = await request.body()
-        expected = hmac.new(
-            settings.WA_APP_SECRET.encode(),
-            body_bytes,
-            hashlib.sha256
-        ).hexdigest()
-        if not hmac.compare_digest(f"sha256={expected}", sig_header):
+        with span("verify_signature"):
+            expected = hmac.new(
+                settings.WA_APP_SECRET.encode(),
+                body_bytes,
+                hashlib.sha256
+            ).hexdigest()
+            valid = hmac.compare_digest(f"sha256={expected}", sig_header)
+        if not valid:
+            set_branch("invalid_signature")
             return Response(content="Invalid signature", status_code=403)
         import json as _json
         data = _json.loads(body_bytes)
@@ -130,7 +157,15 @@ async def webhook(request: Request):
         change = entry["changes"][0]
         value = change["value"]
 
+        # Graph acepta el envío con 200 y avisa acá si después no se entregó
+        # (p. ej. texto libre fuera de la ventana de 24 h)
+        for status in value.get("statuses", []):
+            if status.get("status") == "failed":
+                log.warning("WhatsApp no entregó el mensaje %s a %s: %s",
+                            status.get("id"), status.get("recipient_id"), status.get("errors"))
+
         if "messages" not in value:
+            set_branch("ignored")
             return {"status": "ignored"}
 
         msg = value["messages"][0]
@@ -146,8 +181,8 @@ async def webhook(request: Request):
         elif msg.get("type") == "audio":
             audio_id = msg["audio"]["id"]
             media_url = get_media_url(audio_id)
-            os.makedirs("tmp", exist_ok=True)
-            path = f"tmp/{audio_id}.ogg"
+            os.makedirs(settings.AUDIO_TMP_DIR, exist_ok=True)
+            path = os.path.join(settings.AUDIO_TMP_DIR, f"{audio_id}.ogg")
             download_media(media_url, path)
 
             text_in = transcribe_audio_local(path).strip()
@@ -155,16 +190,26 @@ async def webhook(request: Request):
                 reply = "Recibí tu audio, pero no pude transcribirlo todavía. ¿Podés escribirlo en texto?"
                 send_text(phone, reply)
                 log_message(phone, "out", reply)
+                set_branch("audio_failed")
                 return {"status": "ok"}
 
         else:
             reply = "Por ahora puedo procesar texto o audio 😊"
             send_text(phone, reply)
             log_message(phone, "out", reply)
+            set_branch("unsupported")
             return {"status": "ok"}
 
         log_message(phone, "in", text_in)
 
+        # -------- respuesta a recordatorio (sin IA) --------
+        reply = handle_reminder_reply(phone, text_in)
+        if reply:
+            send_text(phone, reply)
+            log_message(phone, "out", reply)
+            set_branch("reminder_reply")
+            return {"status": "ok"}
+
         # -------- router principal --------
         state = get_state(phone)
         ctx = get_context(phone)
@@ -174,6 +219,7 @@ async def webhook(request: Request):
             reply = menu_text()
             send_text(phone, reply)
             log_message(phone, "out", reply)
+            set_branch("greeting")
             return {"status": "ok"}
 
         # 1) Si está esperando alternativa 1/2
@@ -189,6 +235,7 @@ async def webhook(request: Request):
 
                 set_state(phone, "idle")
                 set_context(phone, {})
+                set_branch("alt_booked")
                 return {"status": "ok"}
 
             # si no mandó 1/2, lo dejamos elegir otra fecha/hora
@@ -198,6 +245,7 @@ async def webhook(request: Request):
                 reply = _handle_booking_result(phone, result)
                 send_text(phone, reply)
                 log_message(phone, "out", reply)
+                set_branch("alt_retry")
                 return {"status": "ok"}
 
         # 2) Menú numérico
@@ -208,6 +256,7 @@ async def webhook(request: Request):
                 reply = "Perfecto 😊 Decime *día y hora* para tu turno (lun-vie 08:00-21:00). Ej: `mañana 10:00`"
                 send_text(phone, reply)
                 log_message(phone, "out", reply)
+                set_branch("menu_booking")
                 return {"status": "ok"}
 
             if choice == "6":
@@ -215,12 +264,14 @@ async def webhook(request: Request):
                 reply = "📌 Listo. Dejanos tu consulta y tu nombre, y te contacta una persona apenas pueda."
                 send_text(phone, reply)
                 log_message(phone, "out", reply)
+                set_branch("menu_human")
                 return {"status": "ok"}
 
             # 2 a 5: respuesta IA usando knowledge
             reply = chat(f"El usuario eligió la opción {choice}. Respondé con la info correspondiente.", history=[])
             send_text(phone, reply)
             log_message(phone, "out", reply)
+            set_branch("menu_ai")
             return {"status": "ok"}
 
         # 3) Booking: si está en modo booking o detecta intención de turno
@@ -229,15 +280,19 @@ async def webhook(request: Request):
             reply = _handle_booking_result(phone, result)
             send_text(phone, reply)
             log_message(phone, "out", reply)
+            set_branch("booking")
             return {"status": "ok"}
 
         # 4) Default: IA general con knowledge
         reply = chat(text_in, history=[])
         send_text(phone, reply)
         log_message(phone, "out", reply)
+        set_branch("ai")
         return {"status": "ok"}
 
     except Exception as e:
+        set_branch("error")
+        log.exception("Error procesando el webhook")
         return {"status": "error", "detail": str(e)}
 
 
@@ -0,0 +1,152 @@
+# app/metrics.py
+"""
+Trazas livianas por etapa + histogramas en formato texto de Prometheus.
+
+Uso:
+  - `@traced("send_text")` o `with span("verify_signature"):` miden una etapa.
+  - `with request_trace("webhook") as trace:` agrupa las etapas de un request;
+    al terminar se registran con el `trace.branch` del router ("error" si se
+    escapa una excepción) y, si el request supera SLOW_REQUEST_MS (o termina
+    en error), se loguea el desglose completo.
+  - Las etapas fuera de un request (p. ej. el scheduler de recordatorios) se
+    registran con branch="background".
+
+Las métricas son por proceso: con varios workers, Prometheus tiene que
+scrapear cada uno (o sumar por instancia).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        # labels -> [conteos por bucket..., +Inf], suma
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(BUCKETS) + 1), 0.0]
+            counts = series[0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1]) for k, v in sorted(self._series.items())]
+        for label_values, counts, total in snapshot:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "botmuni_stage_seconds", "Duración de cada etapa del procesamiento.",
+    ("stage", "provider", "branch"),
+)
+REQUEST_SECONDS = Histogram(
+    "botmuni_request_seconds", "Duración total del request.",
+    ("route", "provider", "branch"),
+)
+
+
+class Trace:
+    def __init__(self, route: str):
+        self.route = route
+        self.branch = "unknown"
+        self.spans: list[tuple[str, float]] = []
+
+
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current.get()
+        if trace is not None:
+            trace.spans.append((stage, elapsed))
+        else:
+            STAGE_SECONDS.observe(elapsed, stage, settings.AI_PROVIDER, "background")
+
+
+def traced(stage: str):
+    """Decorador: mide cada llamada a la función como la etapa `stage`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_branch(branch: str):
+    """Rama del router que resolvió el request actual (etiqueta de las métricas)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.branch = branch
+
+
+@contextmanager
+def request_trace(route: str):
+    trace = Trace(route)
+    token = _current.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    except Exception:
+        # p. ej. un body firmado pero mal formado: que no quede como "unknown"
+        trace.branch = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        provider = settings.AI_PROVIDER
+        # las etapas se registran al final para etiquetarlas con la rama resuelta
+        for stage, seconds in trace.spans:
+            STAGE_SECONDS.observe(seconds, stage, provider, trace.branch)
+        REQUEST_SECONDS.observe(elapsed, route, provider, trace.branch)
+        slow = settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS
+        if slow or trace.branch == "error":
+            breakdown = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace.spans)
+            log.warning("Request %s %s [%s] %.1fms: %s", "lento" if slow else "con error",
+                        route, trace.branch, elapsed * 1000, breakdown)
+
+
+def render() -> str:
+    return "\n".join(STAGE_SECONDS.render() + REQUEST_SECONDS.render()) + "\n"
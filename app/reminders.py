@@ -0,0 +1,184 @@
+# app/reminders.py
+"""
+Recordatorios de turnos.
+
+Un loop asyncio dentro de la app busca los turnos que empiezan dentro de
+REMINDER_LEAD_HOURS, los toma en lotes de REMINDER_BATCH_SIZE y los envía
+de a uno con un tope de REMINDER_SENDS_PER_SECOND, para no competir con el
+tráfico del webhook.
+
+- Con varios workers/nodos cada uno corre el loop, pero sólo barre el que
+  tiene el lease "reminders" del storage (se renueva en cada vuelta y vence
+  a los REMINDER_LEASE_SECONDS si ese worker muere). Así el tope de envíos
+  es global y nadie compite por el cursor. Con STORAGE_BACKEND=memory el
+  lease es por proceso.
+- El cursor del barrido se persiste en el storage: si la app se reinicia a
+  mitad de un lote, sigue desde el último turno leído.
+- Cada recordatorio se reclama (claim_reminder) antes de enviarlo, así un
+  turno recibe uno solo aunque haya varios workers o reinicios. Si el envío
+  falla por algo transitorio (red, 5xx, 429), el reclamo se libera y el
+  próximo barrido lo reintenta; otros 4xx (número inválido, política de
+  Meta) no se reintentan: se loguean y el turno queda reclamado.
+- El tope de envíos se respeta también cuando Graph falla: se espera el
+  intervalo después de cada intento, no sólo de los exitosos.
+- Los turnos sacados con menos de REMINDER_LEAD_HOURS de anticipación no
+  reciben recordatorio: el usuario acaba de ver la confirmación.
+- Como el turno se sacó hace más de REMINDER_LEAD_HOURS, el usuario casi
+  nunca escribió en las últimas 24 h: WhatsApp sólo entrega plantillas
+  aprobadas fuera de esa ventana, así que el recordatorio sale con
+  REMINDER_TEMPLATE. Un texto libre recibe 200 de Graph y después falla de
+  forma asíncrona (el webhook loguea esos estados "failed").
+- Las respuestas "confirmo" / "cancelo" se resuelven sin pasar por la IA.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dateutil import tz
+
+from app.settings import settings
+from app.storage import to_utc_ts, from_utc_ts
+from app.db import (
+    log_message, due_reminders, claim_reminder, unclaim_reminder,
+    pending_reply, set_booking_status, get_cursor, set_cursor, acquire_lease,
+)
+from app.wa_client import send_text, send_template
+from app import calendar_client
+
+log = logging.getLogger(__name__)
+
+CURSOR = "reminders"
+LEASE = "reminders"
+# identifica a este worker como dueño del lease
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def reminder_params(booking: dict) -> list[str]:
+    """Día y hora locales del turno: los parámetros {{1}} y {{2}} de la plantilla."""
+    local = from_utc_ts(booking["start_ts"]).astimezone(tz.gettz(settings.TIMEZONE))
+    return [local.strftime("%d/%m"), local.strftime("%H:%M")]
+
+
+def reminder_text(booking: dict) -> str:
+    day, hour = reminder_params(booking)
+    return (
+        f"⏰ Recordatorio: tenés turno en la Subsecretaría de Capacitación el "
+        f"{day} a las {hour}.\n"
+        "Respondé *confirmo* si vas a venir o *cancelo* para liberar el horario."
+    )
+
+
+def _send(booking: dict, reply: str):
+    if settings.REMINDER_TEMPLATE:
+        return send_template(booking["phone"], settings.REMINDER_TEMPLATE,
+                             settings.REMINDER_TEMPLATE_LANG, reminder_params(booking))
+    return send_text(booking["phone"], reply)
+
+
+# ---------- BARRIDO ----------
+def next_batch(now: datetime) -> list[dict]:
+    """Próximo lote de turnos a recordar, retomando desde el cursor persistido."""
+    after = get_cursor(CURSOR) or ""
+    batch = due_reminders(
+        to_utc_ts(now),
+        to_utc_ts(now + timedelta(hours=settings.REMINDER_LEAD_HOURS)),
+        after,
+        settings.REMINDER_BATCH_SIZE,
+        min_notice_seconds=settings.REMINDER_LEAD_HOURS * 3600,
+    )
+    # lote incompleto = barrido terminado; el próximo arranca de cero y
+    # levanta los turnos agendados detrás del cursor mientras tanto
+    set_cursor(CURSOR, batch[-1]["id"] if len(batch) == settings.REMINDER_BATCH_SIZE else None)
+    return batch
+
+
+def _retryable(status: int) -> bool:
+    return status >= 500 or status == 429
+
+
+def send_reminder(booking: dict) -> bool:
+    """Envía el recordatorio. False si no hubo intento (ya lo reclamó otro worker)."""
+    if not claim_reminder(booking["id"]):
+        return False
+    reply = reminder_text(booking)
+    try:
+        status, body = _send(booking, reply)
+    except Exception:
+        unclaim_reminder(booking["id"])
+        raise
+    if _retryable(status):
+        unclaim_reminder(booking["id"])
+        raise RuntimeError(f"Graph respondió {status}: {body[:200]}")
+    if status >= 400:
+        # reintentar no cambia la respuesta: queda reclamado para no insistir en cada barrido
+        log.error("Graph rechazó el recordatorio del turno %s (%s): %s", booking["id"], status, body[:200])
+        return True
+    log_message(booking["phone"], "out", reply)
+    return True
+
+
+async def send_batch(batch: list[dict]):
+    # <= 0: sin tope de envíos
+    rate = settings.REMINDER_SENDS_PER_SECOND
+    interval = 1 / rate if rate > 0 else 0
+    for booking in batch:
+        try:
+            attempted = await asyncio.to_thread(send_reminder, booking)
+        except Exception:
+            log.exception("No se pudo enviar el recordatorio del turno %s", booking["id"])
+            attempted = True
+        # también después de un fallo: con Graph caído el tope tiene que seguir valiendo
+        if attempted and interval:
+            await asyncio.sleep(interval)
+
+
+async def run_scheduler():
+    while True:
+        try:
+            if not await asyncio.to_thread(acquire_lease, LEASE, WORKER_ID, settings.REMINDER_LEASE_SECONDS):
+                await asyncio.sleep(settings.REMINDER_POLL_SECONDS)
+                continue  # barre otro worker
+            batch = await asyncio.to_thread(next_batch, datetime.now(timezone.utc))
+            await send_batch(batch)
+            if len(batch) == settings.REMINDER_BATCH_SIZE:
+                continue  # quedan más en la ventana: seguir sin esperar
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Falló el barrido de recordatorios")
+        await asyncio.sleep(settings.REMINDER_POLL_SECONDS)
+
+
+# ---------- RESPUESTAS ----------
+def reminder_reply(text: str) -> str | None:
+    t = text.lower().strip(" .!¡*")
+    return t if t in {"confirmo", "cancelo"} else None
+
+
+def handle_reminder_reply(phone: str, text: str) -> str | None:
+    """
+    Si el usuario responde "confirmo"/"cancelo" a un recordatorio pendiente,
+    devuelve la respuesta a enviar. Si no aplica, None (sigue el router normal).
+    """
+    answer = reminder_reply(text)
+    if not answer:
+        return None
+    booking = pending_reply(phone, to_utc_ts(datetime.now(timezone.utc)))
+    if not booking:
+        return None
+
+    if answer == "confirmo":
+        set_booking_status(booking["id"], "attending")
+        return "¡Gracias por confirmar! Te esperamos 😊"
+
+    if booking.get("event_id"):
+        try:
+            calendar_client.delete_event(booking["event_id"])
+        except Exception:
+            # p. ej. 404/410 si ya lo borraron a mano: igual se cancela del lado del bot
+            log.exception("No se pudo borrar el evento %s del calendario", booking["event_id"])
+    set_booking_status(booking["id"], "cancelled")
+    return "Listo, cancelamos tu turno. Si querés sacar otro, escribí *turno*."
@@ -1,33 +1,67 @@
 # app/settings.py
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
 class Settings:
     WA_VERIFY_TOKEN = os.getenv("WA_VERIFY_TOKEN", "")
     WA_APP_SECRET = os.getenv("WA_APP_SECRET", "")  # App Secret de Meta (para validar firma HMAC)
     WA_PHONE_NUMBER_ID = os.getenv("WA_PHONE_NUMBER_ID", "")
     WA_ACCESS_TOKEN = os.getenv("WA_ACCESS_TOKEN", "")
+    WA_GRAPH_URL = os.getenv("WA_GRAPH_URL", "https://graph.facebook.com/v20.0")
     BASE_URL = os.getenv("BASE_URL", "")
 
     GOOGLE_CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID", "primary")
     GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE", "service_account.json")
     TIMEZONE = os.getenv("TIMEZONE", "America/Argentina/Buenos_Aires")
+    # Sólo para pruebas locales (bench/): apunta a un fake y usa credenciales anónimas
+    GOOGLE_CALENDAR_API_URL = os.getenv("GOOGLE_CALENDAR_API_URL", "")
 
     BOT_NAME = os.getenv("BOT_NAME", "Bot Turnos")
     DEFAULT_SLOT_MINUTES = int(os.getenv("DEFAULT_SLOT_MINUTES", "30"))
 
     TEST_API_KEY = os.getenv("TEST_API_KEY", "")  # Protege los endpoints /test/
 
+    AUDIO_TMP_DIR = os.getenv("AUDIO_TMP_DIR", "tmp")  # audios descargados para transcribir
+
+    # Estado compartido: sqlite | memory | kv (ver app/storage.py)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+    # Relativo a la raíz del proyecto, no al directorio de trabajo
+    DB_PATH = str(PROJECT_ROOT / os.getenv("DB_PATH", "bot_sqlite3"))
+    KV_URL = os.getenv("KV_URL", "")  # p. ej. http://consul:8500
+    KV_PREFIX = os.getenv("KV_PREFIX", "botmuni")
+
+    # Recordatorios de turnos (ver app/reminders.py)
+    REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() == "true"
+    REMINDER_LEAD_HOURS = int(os.getenv("REMINDER_LEAD_HOURS", "24"))  # cuánto antes del turno
+    REMINDER_POLL_SECONDS = int(os.getenv("REMINDER_POLL_SECONDS", "60"))
+    REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "50"))
+    REMINDER_SENDS_PER_SECOND = float(os.getenv("REMINDER_SENDS_PER_SECOND", "1"))  # tope global de envíos (<= 0: sin tope)
+    # Sólo barre el worker que tiene el lease; tiene que durar más que un lote + REMINDER_POLL_SECONDS
+    REMINDER_LEASE_SECONDS = int(os.getenv("REMINDER_LEASE_SECONDS", "300"))
+    # El recordatorio sale fuera de la ventana de 24 h de WhatsApp: sólo se entrega
+    # como plantilla aprobada en Meta, con {{1}} = día (dd/mm) y {{2}} = hora (HH:MM).
+    # Vacío = texto libre, que Graph acepta pero no entrega (sólo sirve para pruebas).
+    REMINDER_TEMPLATE = os.getenv("REMINDER_TEMPLATE", "recordatorio_turno")
+    REMINDER_TEMPLATE_LANG = os.getenv("REMINDER_TEMPLATE_LANG", "es_AR")
+
+    # Loguea el desglose por etapa de los requests más lentos que esto (0 = apagado)
+    SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "0"))
+
     AI_PROVIDER = os.getenv("AI_PROVIDER", "ollama").lower()
     OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,649 @@
+# app/storage.py
+"""
+Backends de almacenamiento para el estado de usuarios, el log de mensajes
+y los turnos agendados (usados por los recordatorios).
+
+Todos implementan la misma interfaz (`Storage`) y se eligen con
+STORAGE_BACKEND en el .env:
+  - sqlite: archivo local (por defecto). Sirve para un solo host.
+  - memory: en el proceso. Para tests; no se comparte entre workers.
+  - kv:     key-value por red con la API HTTP de Consul
+            (GET/PUT /v1/kv/<key>). Permite varios workers/nodos
+            detrás de un balanceador compartiendo el estado.
+"""
+import base64
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import requests
+
+from app.settings import settings
+
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S"  # start_ts / created_at de los turnos, en UTC
+
+
+def to_utc_ts(dt: datetime) -> str:
+    """datetime con zona → 'YYYY-MM-DDTHH:MM:SS' en UTC (formato de start_ts)."""
+    return dt.astimezone(timezone.utc).strftime(TS_FORMAT)
+
+
+def from_utc_ts(ts: str) -> datetime:
+    return datetime.strptime(ts, TS_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _msg_ts() -> str:
+    # mismo formato que datetime('now') de SQLite
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _utc_ts() -> str:
+    return datetime.utcnow().strftime(TS_FORMAT)
+
+
+def _notice_seconds(b: dict) -> float:
+    """Anticipación con la que se sacó el turno (start_ts - created_at)."""
+    return (datetime.strptime(b["start_ts"], TS_FORMAT)
+            - datetime.strptime(b["created_at"], TS_FORMAT)).total_seconds()
+
+
+def new_booking_id(start_ts: str) -> str:
+    """Id de turno que ordena por horario: '<start_ts>-<uuid>'."""
+    return f"{start_ts}-{uuid.uuid4().hex[:12]}"
+
+
+def _load_context(raw) -> dict:
+    try:
+        ctx = json.loads(raw or "{}")
+    except (TypeError, ValueError):
+        return {}
+    return ctx if isinstance(ctx, dict) else {}
+
+
+class Storage(ABC):
+    """
+    Interfaz común. Los métodos de usuario ignoran teléfonos que no existen.
+    Un backend que no implemente algún método falla al instanciarse.
+    """
+
+    def init(self):
+        pass
+
+    @abstractmethod
+    def upsert_user(self, phone: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_state(self, phone: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_state(self, phone: str, state: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_context(self, phone: str) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_context(self, phone: str, ctx: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def log_message(self, phone: str, direction: str, text: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_messages(self, phone: str) -> list[dict]:
+        """Mensajes del teléfono en orden de llegada: [{direction, text, ts}]."""
+        raise NotImplementedError
+
+    # Turnos. start_ts/created_at son UTC 'YYYY-MM-DDTHH:MM:SS'; status: booked | attending | cancelled.
+    # Un turno es {id, phone, event_id, start_ts, created_at, status, reminded}.
+
+    @abstractmethod
+    def add_booking(self, phone: str, event_id: str, start_ts: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def due_reminders(self, start_from: str, start_to: str, after: str, limit: int,
+                      min_notice_seconds: int = 0) -> list[dict]:
+        """
+        Turnos 'booked' sin recordatorio con start_ts en [start_from, start_to], id > after,
+        ordenados por id. Omite los sacados con min_notice_seconds o menos de anticipación.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_reminder(self, booking_id: str) -> bool:
+        """Marca el recordatorio como enviado. True sólo para el primero que lo reclama."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def unclaim_reminder(self, booking_id: str):
+        """Libera el reclamo (el envío falló) para que el próximo barrido lo reintente."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def pending_reply(self, phone: str, now_ts: str) -> dict | None:
+        """Próximo turno futuro 'booked' del teléfono que ya recibió recordatorio."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_booking_status(self, booking_id: str, status: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_cursor(self, name: str) -> str | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_cursor(self, name: str, value: str | None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Toma o renueva el lease `name` por ttl_seconds. True si owner lo tiene;
+        False si lo tiene otro y todavía no venció.
+        """
+        raise NotImplementedError
+
+
+# ---------- SQLITE ----------
+class SQLiteStorage(Storage):
+    def __init__(self, path: str | Path, timeout: float = 10.0):
+        self.path = Path(path)
+        self.timeout = timeout
+
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        # espera en vez de fallar con "database is locked" si otro worker escribe
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _execute(self, sql: str, params=()):
+        conn = self._conn()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _write(self, sql: str, params=()) -> int:
+        """Como _execute, pero devuelve la cantidad de filas afectadas."""
+        conn = self._conn()
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def init(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        try:
+            # WAL: los lectores no bloquean al escritor (queda persistido en el archivo)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    phone VARCHAR PRIMARY KEY,
+                    name VARCHAR(20),
+                    last_seen TEXT,
+                    state TEXT DEFAULT 'idle',
+                    context_json TEXT DEFAULT '{}'
+                );
+                """)
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone VARCHAR(15),
+                    direction TEXT, -- in/out
+                    text TEXT,
+                    ts TEXT
+                );
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_phone ON messages(phone, id)")
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS bookings (
+                    id TEXT PRIMARY KEY,
+                    phone VARCHAR(15),
+                    event_id TEXT,
+                    start_ts TEXT, -- UTC
+                    created_at TEXT, -- UTC
+                    status TEXT DEFAULT 'booked',
+                    reminded_at TEXT
+                );
+                """)
+                # sólo indexa lo pendiente: el barrido del scheduler no recorre el histórico
+                conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_bookings_due ON bookings(start_ts, id)
+                WHERE reminded_at IS NULL AND status='booked'
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_phone ON bookings(phone, start_ts)")
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS cursors (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """)
+                conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT,
+                    expires_at REAL -- epoch
+                );
+                """)
+        finally:
+            conn.close()
+
+    def upsert_user(self, phone: str):
+        self._execute("""
+        INSERT INTO users(phone, last_seen) VALUES(?, ?)
+        ON CONFLICT(phone) DO UPDATE SET last_seen=excluded.last_seen;
+        """, (phone, _now()))
+
+    def get_state(self, phone: str) -> str:
+        rows = self._execute("SELECT state FROM users WHERE phone=?", (phone,))
+        return rows[0]["state"] if rows else "idle"
+
+    def set_state(self, phone: str, state: str):
+        self._execute("UPDATE users SET state=? WHERE phone=?", (state, phone))
+
+    def get_context(self, phone: str) -> dict:
+        rows = self._execute("SELECT context_json FROM users WHERE phone=?", (phone,))
+        return _load_context(rows[0]["context_json"]) if rows else {}
+
+    def set_context(self, phone: str, ctx: dict):
+        self._execute("UPDATE users SET context_json=? WHERE phone=?",
+                      (json.dumps(ctx, ensure_ascii=False), phone))
+
+    def log_message(self, phone: str, direction: str, text: str):
+        self._execute("INSERT INTO messages(phone, direction, text, ts) VALUES(?,?,?,datetime('now'))",
+                      (phone, direction, text))
+
+    def get_messages(self, phone: str) -> list[dict]:
+        rows = self._execute("SELECT direction, text, ts FROM messages WHERE phone=? ORDER BY id", (phone,))
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _booking(row) -> dict:
+        b = dict(row)
+        b["reminded"] = b.pop("reminded_at") is not None
+        return b
+
+    def add_booking(self, phone: str, event_id: str, start_ts: str) -> str:
+        booking_id = new_booking_id(start_ts)
+        self._execute("INSERT INTO bookings(id, phone, event_id, start_ts, created_at) VALUES(?,?,?,?,?)",
+                      (booking_id, phone, event_id, start_ts, _utc_ts()))
+        return booking_id
+
+    def due_reminders(self, start_from: str, start_to: str, after: str, limit: int,
+                      min_notice_seconds: int = 0) -> list[dict]:
+        rows = self._execute("""
+        SELECT * FROM bookings
+        WHERE reminded_at IS NULL AND status='booked'
+          AND start_ts BETWEEN ? AND ? AND id > ?
+          AND start_ts > strftime('%Y-%m-%dT%H:%M:%S', created_at, ?)
+        ORDER BY start_ts, id LIMIT ?
+        """, (start_from, start_to, after, f"+{int(min_notice_seconds)} seconds", limit))
+        return [self._booking(r) for r in rows]
+
+    def claim_reminder(self, booking_id: str) -> bool:
+        return self._write("UPDATE bookings SET reminded_at=? WHERE id=? AND reminded_at IS NULL",
+                           (_now(), booking_id)) == 1
+
+    def unclaim_reminder(self, booking_id: str):
+        self._execute("UPDATE bookings SET reminded_at=NULL WHERE id=?", (booking_id,))
+
+    def pending_reply(self, phone: str, now_ts: str) -> dict | None:
+        rows = self._execute("""
+        SELECT * FROM bookings
+        WHERE phone=? AND status='booked' AND reminded_at IS NOT NULL AND start_ts > ?
+        ORDER BY start_ts, id LIMIT 1
+        """, (phone, now_ts))
+        return self._booking(rows[0]) if rows else None
+
+    def set_booking_status(self, booking_id: str, status: str):
+        self._execute("UPDATE bookings SET status=? WHERE id=?", (status, booking_id))
+
+    def get_cursor(self, name: str) -> str | None:
+        rows = self._execute("SELECT value FROM cursors WHERE name=?", (name,))
+        return rows[0]["value"] if rows else None
+
+    def set_cursor(self, name: str, value: str | None):
+        if value is None:
+            self._execute("DELETE FROM cursors WHERE name=?", (name,))
+        else:
+            self._execute("""
+            INSERT INTO cursors(name, value) VALUES(?, ?)
+            ON CONFLICT(name) DO UPDATE SET value=excluded.value;
+            """, (name, value))
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        return self._write("""
+        INSERT INTO leases(name, owner, expires_at) VALUES(?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at
+        WHERE leases.owner=excluded.owner OR leases.expires_at < ?;
+        """, (name, owner, now + ttl_seconds, now)) == 1
+
+
+# ---------- MEMORIA ----------
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: dict[str, dict] = {}
+        self._messages: list[dict] = []
+        self._bookings: dict[str, dict] = {}
+        self._cursors: dict[str, str] = {}
+        self._leases: dict[str, tuple[str, float]] = {}
+
+    def upsert_user(self, phone: str):
+        with self._lock:
+            user = self._users.setdefault(phone, {"state": "idle", "context": "{}"})
+            user["last_seen"] = _now()
+
+    def get_state(self, phone: str) -> str:
+        with self._lock:
+            user = self._users.get(phone)
+            return user["state"] if user else "idle"
+
+    def set_state(self, phone: str, state: str):
+        with self._lock:
+            if phone in self._users:
+                self._users[phone]["state"] = state
+
+    def get_context(self, phone: str) -> dict:
+        with self._lock:
+            user = self._users.get(phone)
+            return _load_context(user["context"]) if user else {}
+
+    def set_context(self, phone: str, ctx: dict):
+        # se guarda serializado para no compartir referencias con quien llama
+        raw = json.dumps(ctx, ensure_ascii=False)
+        with self._lock:
+            if phone in self._users:
+                self._users[phone]["context"] = raw
+
+    def log_message(self, phone: str, direction: str, text: str):
+        with self._lock:
+            self._messages.append({"phone": phone, "direction": direction, "text": text, "ts": _msg_ts()})
+
+    def get_messages(self, phone: str) -> list[dict]:
+        with self._lock:
+            return [
+                {"direction": m["direction"], "text": m["text"], "ts": m["ts"]}
+                for m in self._messages if m["phone"] == phone
+            ]
+
+    def add_booking(self, phone: str, event_id: str, start_ts: str) -> str:
+        booking_id = new_booking_id(start_ts)
+        with self._lock:
+            self._bookings[booking_id] = {
+                "id": booking_id, "phone": phone, "event_id": event_id,
+                "start_ts": start_ts, "created_at": _utc_ts(), "status": "booked", "reminded": False,
+            }
+        return booking_id
+
+    def due_reminders(self, start_from: str, start_to: str, after: str, limit: int,
+                      min_notice_seconds: int = 0) -> list[dict]:
+        with self._lock:
+            due = [
+                dict(b) for b in self._bookings.values()
+                if not b["reminded"] and b["status"] == "booked"
+                and start_from <= b["start_ts"] <= start_to and b["id"] > after
+                and _notice_seconds(b) > min_notice_seconds
+            ]
+        return sorted(due, key=lambda b: b["id"])[:limit]
+
+    def claim_reminder(self, booking_id: str) -> bool:
+        with self._lock:
+            b = self._bookings.get(booking_id)
+            if not b or b["reminded"]:
+                return False
+            b["reminded"] = True
+            return True
+
+    def unclaim_reminder(self, booking_id: str):
+        with self._lock:
+            if booking_id in self._bookings:
+                self._bookings[booking_id]["reminded"] = False
+
+    def pending_reply(self, phone: str, now_ts: str) -> dict | None:
+        with self._lock:
+            pending = [
+                dict(b) for b in self._bookings.values()
+                if b["phone"] == phone and b["status"] == "booked"
+                and b["reminded"] and b["start_ts"] > now_ts
+            ]
+        return min(pending, key=lambda b: b["id"]) if pending else None
+
+    def set_booking_status(self, booking_id: str, status: str):
+        with self._lock:
+            if booking_id in self._bookings:
+                self._bookings[booking_id]["status"] = status
+
+    def get_cursor(self, name: str) -> str | None:
+        with self._lock:
+            return self._cursors.get(name)
+
+    def set_cursor(self, name: str, value: str | None):
+        with self._lock:
+            if value is None:
+                self._cursors.pop(name, None)
+            else:
+                self._cursors[name] = value
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder, expires_at = self._leases.get(name, (owner, 0.0))
+            if holder != owner and expires_at >= now:
+                return False
+            self._leases[name] = (owner, now + ttl_seconds)
+            return True
+
+
+# ---------- KEY-VALUE POR RED ----------
+class KVStorage(Storage):
+    """
+    Cada campo del usuario es una clave propia (users/<phone>/state, .../context,
+    .../last_seen), así cada operación es un único PUT y dos workers que
+    actualizan campos distintos no se pisan. Los mensajes van en claves
+    messages/<phone>/<ts>-<uuid>, ordenables por nombre.
+
+    Turnos: bookings/<YYYY-MM-DD>/<id>, particionados por día de start_ts: el
+    barrido sólo lista los días de la ventana, no el histórico completo (el id
+    empieza con start_ts, así cada día ya sale ordenado por horario). El reclamo del recordatorio usa
+    reminded/<id> con ?cas=0, que sólo crea la clave si no existe.
+
+    Leases: leases/<name> con {owner, expires_at}; se toman con ?cas=<ModifyIndex>
+    (o cas=0 si no existe), así dos workers no pueden quedarse con el mismo.
+    """
+
+    def __init__(self, base_url: str, prefix: str = "botmuni", timeout: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self.prefix = prefix.strip("/")
+        self.timeout = timeout
+        self._http = requests.Session()  # keep-alive entre requests
+
+    def _url(self, key: str) -> str:
+        return f"{self.base_url}/v1/kv/{self.prefix}/{key}"
+
+    def _get(self, key: str) -> str | None:
+        r = self._http.get(self._url(key), params={"raw": ""}, timeout=self.timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.content.decode("utf-8")
+
+    def _get_indexed(self, key: str) -> tuple[str | None, int]:
+        """Valor y ModifyIndex (para ?cas=). (None, 0) si no existe."""
+        r = self._http.get(self._url(key), timeout=self.timeout)
+        if r.status_code == 404:
+            return None, 0
+        r.raise_for_status()
+        entry = r.json()[0]
+        return base64.b64decode(entry["Value"] or "").decode("utf-8"), entry["ModifyIndex"]
+
+    def _put(self, key: str, value: str, **params) -> bool:
+        r = self._http.put(self._url(key), data=value.encode("utf-8"), params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r.text.strip() == "true"
+
+    def _delete(self, key: str):
+        r = self._http.delete(self._url(key), timeout=self.timeout)
+        r.raise_for_status()
+
+    def _keys(self, prefix: str) -> list[str]:
+        """Claves bajo prefix, ordenadas y sin el prefijo global."""
+        r = self._http.get(self._url(prefix), params={"keys": ""}, timeout=self.timeout)
+        if r.status_code == 404:
+            return []
+        r.raise_for_status()
+        return sorted(k.removeprefix(f"{self.prefix}/") for k in r.json())
+
+    def _exists(self, phone: str) -> bool:
+        return self._get(f"users/{phone}/last_seen") is not None
+
+    def upsert_user(self, phone: str):
+        self._put(f"users/{phone}/last_seen", _now())
+
+    def get_state(self, phone: str) -> str:
+        return self._get(f"users/{phone}/state") or "idle"
+
+    def set_state(self, phone: str, state: str):
+        if self._exists(phone):
+            self._put(f"users/{phone}/state", state)
+
+    def get_context(self, phone: str) -> dict:
+        return _load_context(self._get(f"users/{phone}/context"))
+
+    def set_context(self, phone: str, ctx: dict):
+        if self._exists(phone):
+            self._put(f"users/{phone}/context", json.dumps(ctx, ensure_ascii=False))
+
+    def log_message(self, phone: str, direction: str, text: str):
+        value = json.dumps({"direction": direction, "text": text, "ts": _msg_ts()}, ensure_ascii=False)
+        self._put(f"messages/{phone}/{_now()}-{uuid.uuid4().hex}", value)
+
+    def get_messages(self, phone: str) -> list[dict]:
+        out = []
+        for key in self._keys(f"messages/{phone}/"):
+            raw = self._get(key)
+            if raw:
+                out.append(json.loads(raw))
+        return out
+
+    @staticmethod
+    def _booking_key(booking_id: str) -> str:
+        return f"bookings/{booking_id[:10]}/{booking_id}"
+
+    def _booking(self, booking_id: str) -> dict | None:
+        raw = self._get(self._booking_key(booking_id))
+        if not raw:
+            return None
+        b = json.loads(raw)
+        b["reminded"] = self._get(f"reminded/{booking_id}") is not None
+        return b
+
+    def add_booking(self, phone: str, event_id: str, start_ts: str) -> str:
+        booking_id = new_booking_id(start_ts)
+        self._put(self._booking_key(booking_id), json.dumps({
+            "id": booking_id, "phone": phone, "event_id": event_id,
+            "start_ts": start_ts, "created_at": _utc_ts(), "status": "booked",
+        }))
+        self._put(f"users/{phone}/bookings/{booking_id}", "")
+        return booking_id
+
+    def due_reminders(self, start_from: str, start_to: str, after: str, limit: int,
+                      min_notice_seconds: int = 0) -> list[dict]:
+        out = []
+        # con cursor, los días anteriores al último id leído ya se recorrieron
+        day = datetime.strptime(max(start_from, after)[:10], "%Y-%m-%d")
+        while (prefix := f"bookings/{day:%Y-%m-%d}/") <= f"bookings/{start_to[:10]}/":
+            for key in self._keys(prefix):
+                booking_id = key.removeprefix(prefix)
+                if booking_id <= after or booking_id < start_from:
+                    continue
+                if booking_id[:len(start_to)] > start_to:
+                    return out  # ids ordenados por horario: el resto cae fuera de la ventana
+                b = self._booking(booking_id)
+                if (b and b["status"] == "booked" and not b["reminded"]
+                        and start_from <= b["start_ts"] <= start_to and _notice_seconds(b) > min_notice_seconds):
+                    out.append(b)
+                    if len(out) >= limit:
+                        return out
+            day += timedelta(days=1)
+        return out
+
+    def claim_reminder(self, booking_id: str) -> bool:
+        return self._put(f"reminded/{booking_id}", _now(), cas=0)
+
+    def unclaim_reminder(self, booking_id: str):
+        self._delete(f"reminded/{booking_id}")
+
+    def pending_reply(self, phone: str, now_ts: str) -> dict | None:
+        prefix = f"users/{phone}/bookings/"
+        for key in self._keys(prefix):
+            booking_id = key.removeprefix(prefix)
+            if booking_id[:len(now_ts)] <= now_ts:
+                continue  # ya pasó
+            b = self._booking(booking_id)
+            if b and b["status"] == "booked" and b["reminded"]:
+                return b
+        return None
+
+    def set_booking_status(self, booking_id: str, status: str):
+        b = self._booking(booking_id)
+        if b:
+            b["status"] = status
+            b.pop("reminded")
+            self._put(self._booking_key(booking_id), json.dumps(b))
+
+    def get_cursor(self, name: str) -> str | None:
+        return self._get(f"cursors/{name}")
+
+    def set_cursor(self, name: str, value: str | None):
+        if value is None:
+            self._delete(f"cursors/{name}")
+        else:
+            self._put(f"cursors/{name}", value)
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        key = f"leases/{name}"
+        raw, index = self._get_indexed(key)
+        if raw is not None:
+            lease = json.loads(raw)
+            if lease["owner"] != owner and lease["expires_at"] >= time.time():
+                return False
+        value = json.dumps({"owner": owner, "expires_at": time.time() + ttl_seconds})
+        # si otro worker lo tomó entre el GET y el PUT, cas falla y devuelve False
+        return self._put(key, value, cas=index)
+
+
+# ---------- SELECCIÓN ----------
+def make_storage(backend: str | None = None) -> Storage:
+    backend = (backend or settings.STORAGE_BACKEND).lower()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "kv":
+        if not settings.KV_URL:
+            raise ValueError("STORAGE_BACKEND=kv requiere KV_URL en el .env.")
+        return KVStorage(settings.KV_URL, prefix=settings.KV_PREFIX)
+    if backend == "sqlite":
+        return SQLiteStorage(settings.DB_PATH)
+    raise ValueError(f"STORAGE_BACKEND desconocido: {backend!r}")
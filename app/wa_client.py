@@ -1,8 +1,10 @@
 import requests
 from app.settings import settings
+from app.metrics import traced
 
-GRAPH = "https://graph.facebook.com/v20.0"
+GRAPH = settings.WA_GRAPH_URL.rstrip("/")
 
+@traced("send_text")
 def send_text(to_phone: str, text:str):
     url=f"{GRAPH}/{settings.WA_PHONE_NUMBER_ID}/messages"
     headers = {
@@ -18,6 +20,34 @@ def send_text(to_phone: str, text:str):
     r = requests.post(url, headers=headers, json=payload, timeout=30)
     return r.status_code, r.text
 
+@traced("send_template")
+def send_template(to_phone: str, name: str, language: str, params: list[str]):
+    """
+    Plantilla aprobada en Meta. Es lo único que WhatsApp entrega fuera de la
+    ventana de 24 h desde el último mensaje del usuario.
+    """
+    url=f"{GRAPH}/{settings.WA_PHONE_NUMBER_ID}/messages"
+    headers = {
+        "Authorization": f"Bearer {settings.WA_ACCESS_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": to_phone,
+        "type": "template",
+        "template": {
+            "name": name,
+            "language": {"code": language},
+            "components": [{
+                "type": "body",
+                "parameters": [{"type": "text", "text": p} for p in params],
+            }],
+        },
+    }
+    r = requests.post(url, headers=headers, json=payload, timeout=30)
+    return r.status_code, r.text
+
+@traced("get_media_url")
 def get_media_url(media_id: str) -> str:
     url = f"{GRAPH}/{media_id}"
     headers = {
@@ -27,6 +57,7 @@ def get_media_url(media_id: str) -> str:
     r.raise_for_status()
     return r.json()["url"]
 
+@traced("download_media")
 def download_media(media_url: str, out_path: str):
     headers = {"Authorization": f"Bearer {settings.WA_ACCESS_TOKEN}"}
     with requests.get(media_url, headers=headers, stream=True, timeout=60) as r:
@@ -0,0 +1,250 @@
+# bench/fakes.py
+"""
+Servidores HTTP locales que reemplazan a los servicios externos en el bench
+y en los tests: Graph API (WhatsApp), Ollama, OpenAI, Gemini, Google Calendar
+y el KV de Consul (STORAGE_BACKEND=kv).
+
+Cada fake acepta latencia (fija + jitter) y una tasa de errores 500, y
+cuenta las llamadas por ruta. Sólo usa la stdlib.
+"""
+import base64
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import wave
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeService:
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls: Counter = Counter()
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "FakeService":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, method: str, path: str, query: dict, body: bytes) -> tuple[int, bytes | dict | list, str]:
+        """
+        Devuelve (status, cuerpo, content-type). Los dict/list se serializan a JSON.
+        query es el resultado de parse_qs (incluye parámetros vacíos como ?raw).
+        """
+        raise NotImplementedError
+
+    def _delay_and_fail(self) -> bool:
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return fail
+
+    def _handler_class(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como los clientes reales
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                url = urlsplit(self.path)
+                path = url.path
+                with service._lock:
+                    service.calls[f"{self.command} {_route_name(path)}"] += 1
+
+                if service._delay_and_fail():
+                    with service._lock:
+                        service.errors += 1
+                    status, payload, ctype = 500, {"error": "injected"}, "application/json"
+                else:
+                    query = parse_qs(url.query, keep_blank_values=True)
+                    status, payload, ctype = service.route(self.command, path, query, body)
+
+                data = json.dumps(payload).encode() if isinstance(payload, (dict, list)) else payload
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _route_name(path: str) -> str:
+    # agrupa ids en las rutas para que el conteo no explote
+    return re.sub(r"/(?=[^/]*\d)[^/]{6,}", "/:id", path)
+
+
+def _json_body(body: bytes) -> dict:
+    try:
+        return json.loads(body or b"{}")
+    except ValueError:
+        return {}
+
+
+def silent_wav(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * int(rate * seconds))
+    return buf.getvalue()
+
+
+REPLY = "Respuesta de prueba del asistente."
+
+
+# ---------- WHATSAPP (GRAPH API) ----------
+class GraphFake(FakeService):
+    """WA_GRAPH_URL: /<phone_id>/messages, /<media_id> y la descarga /media/<id>."""
+    name = "graph"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.audio = silent_wav()
+
+    def route(self, method, path, query, body):
+        if path.startswith("/media/"):
+            return 200, self.audio, "audio/wav"
+        if method == "POST" and path.endswith("/messages"):
+            return 200, {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}]}, "application/json"
+        if method == "GET":
+            media_id = path.strip("/")
+            return 200, {"id": media_id, "url": f"{self.url}/media/{media_id}"}, "application/json"
+        return 404, {"error": "not found"}, "application/json"
+
+
+# ---------- LLMs ----------
+class OllamaFake(FakeService):
+    """OLLAMA_URL: POST /api/chat."""
+    name = "ollama"
+
+    def route(self, method, path, query, body):
+        if path == "/api/chat":
+            return 200, {"message": {"role": "assistant", "content": REPLY}, "done": True}, "application/json"
+        return 404, {"error": "not found"}, "application/json"
+
+
+class OpenAIFake(FakeService):
+    """OPENAI_BASE_URL: POST /chat/completions."""
+    name = "openai"
+
+    def route(self, method, path, query, body):
+        if path == "/chat/completions":
+            return 200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}}]}, "application/json"
+        return 404, {"error": "not found"}, "application/json"
+
+
+class GeminiFake(FakeService):
+    """GEMINI_BASE_URL: POST /models/<model>:generateContent."""
+    name = "gemini"
+
+    def route(self, method, path, query, body):
+        if path.endswith(":generateContent"):
+            return 200, {"candidates": [{"content": {"role": "model", "parts": [{"text": REPLY}]}}]}, "application/json"
+        return 404, {"error": "not found"}, "application/json"
+
+
+# ---------- GOOGLE CALENDAR ----------
+class CalendarFake(FakeService):
+    """
+    GOOGLE_CALENDAR_API_URL: freeBusy y alta/baja de eventos.
+    busy_rate: probabilidad de que el horario consultado figure ocupado.
+    """
+    name = "calendar"
+
+    def __init__(self, *args, busy_rate: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.busy_rate = busy_rate
+
+    def route(self, method, path, query, body):
+        if method == "POST" and path.endswith("/freeBusy"):
+            req = _json_body(body)
+            with self._lock:
+                busy = self._rng.random() < self.busy_rate
+            calendars = {
+                item["id"]: {"busy": [{"start": req.get("timeMin"), "end": req.get("timeMax")}] if busy else []}
+                for item in req.get("items", [])
+            }
+            return 200, {"kind": "calendar#freeBusy", "calendars": calendars}, "application/json"
+        if method == "POST" and path.endswith("/events"):
+            event_id = uuid.uuid4().hex
+            return 200, {"id": event_id, "htmlLink": f"{self.url}/event/{event_id}"}, "application/json"
+        if method == "DELETE" and "/events/" in path:
+            return 204, b"", "application/json"
+        return 404, {"error": "not found"}, "application/json"
+
+
+# ---------- CONSUL KV ----------
+class ConsulKVFake(FakeService):
+    """
+    KV_URL: el subconjunto de /v1/kv que usa KVStorage.
+    GET ?raw, GET con metadatos (ModifyIndex), GET ?keys (por prefijo),
+    PUT (con ?cas=0 = crear si no existe, ?cas=N = sólo si no cambió) y DELETE.
+    """
+    name = "consul"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data: dict[str, bytes] = {}
+        self._index: dict[str, int] = {}
+        self._last_index = 0
+
+    def route(self, method, path, query, body):
+        if not path.startswith("/v1/kv/"):
+            return 404, {"error": "not found"}, "application/json"
+        key = path.removeprefix("/v1/kv/")
+        with self._lock:
+            if method == "GET" and "keys" in query:
+                keys = sorted(k for k in self.data if k.startswith(key))
+                return (200, keys, "application/json") if keys else (404, b"", "text/plain")
+            if method == "GET":
+                if key not in self.data:
+                    return 404, b"", "text/plain"
+                if "raw" in query:
+                    return 200, self.data[key], "application/octet-stream"
+                return 200, [{
+                    "Key": key, "ModifyIndex": self._index[key],
+                    "Value": base64.b64encode(self.data[key]).decode(),
+                }], "application/json"
+            if method == "PUT":
+                if "cas" in query and int(query["cas"][0]) != self._index.get(key, 0):
+                    return 200, b"false", "application/json"
+                self._last_index += 1
+                self.data[key] = body
+                self._index[key] = self._last_index
+                return 200, b"true", "application/json"
+            if method == "DELETE":
+                self.data.pop(key, None)
+                self._index.pop(key, None)
+                return 200, b"true", "application/json"
+        return 405, {"error": "method not allowed"}, "application/json"
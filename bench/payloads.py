@@ -0,0 +1,94 @@
+# bench/payloads.py
+"""
+Generador de webhooks firmados (X-Hub-Signature-256) con conversaciones
+realistas: saludos, opciones del menú, turnos, consultas libres y audios.
+
+Cada conversación usa un teléfono propio y sus mensajes se envían en orden,
+porque el router depende del estado del usuario.
+"""
+import hashlib
+import hmac
+import json
+import random
+import uuid
+from datetime import date, timedelta
+
+DEFAULT_MIX = {"greeting": 30, "menu": 25, "booking": 20, "faq": 15, "audio": 10}
+
+FAQS = [
+    "¿Qué requisitos hay para la beca universitaria?",
+    "Necesito saber qué documentación tengo que presentar para renovar la beca",
+    "¿Hasta cuándo hay tiempo para inscribirse?",
+    "¿Qué descuentos hay en las carreras 2026?",
+    "¿Dónde queda la oficina?",
+]
+
+
+def sign(body: bytes, secret: str) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def envelope(phone: str, message: dict) -> dict:
+    """Cuerpo del webhook tal como lo manda Meta."""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "bench",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"phone_number_id": "bench"},
+                    "messages": [{**message, "from": phone, "id": f"wamid.{uuid.uuid4().hex}"}],
+                },
+            }],
+        }],
+    }
+
+
+def text(body: str) -> dict:
+    return {"type": "text", "text": {"body": body}}
+
+
+def audio() -> dict:
+    return {"type": "audio", "audio": {"id": f"media{uuid.uuid4().hex[:12]}", "mime_type": "audio/ogg"}}
+
+
+def _next_weekday_slot(rng: random.Random) -> str:
+    day = date.today() + timedelta(days=rng.randint(1, 14))
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return f"{day.strftime('%d/%m/%Y')} {rng.randint(8, 20):02d}:{rng.choice(['00', '30'])}"
+
+
+def conversation(kind: str, rng: random.Random) -> list[dict]:
+    if kind == "greeting":
+        return [text(rng.choice(["hola", "Hola", "buenas", "menu"]))]
+    if kind == "menu":
+        return [text("hola"), text(rng.choice(["2", "3", "4", "5", "6"]))]
+    if kind == "booking":
+        return [text("hola"), text("1"), text(_next_weekday_slot(rng))]
+    if kind == "faq":
+        return [text(rng.choice(FAQS))]
+    if kind == "audio":
+        return [audio()]
+    raise ValueError(f"Tipo de conversación desconocido: {kind!r}")
+
+
+def generate(n: int, secret: str, mix: dict[str, int] | None = None, seed: int = 0) -> list[list[tuple[str, bytes, str]]]:
+    """
+    n conversaciones; cada una es una lista de (tipo, body, firma) lista para
+    POST /webhook.
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=n)
+    out = []
+    for i, kind in enumerate(kinds):
+        phone = f"54900{seed:03d}{i:07d}"
+        msgs = []
+        for message in conversation(kind, rng):
+            body = json.dumps(envelope(phone, message)).encode()
+            msgs.append((kind, body, sign(body, secret)))
+        out.append(msgs)
+    return out
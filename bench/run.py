@@ -0,0 +1,333 @@
+# bench/run.py
+"""
+Benchmark offline de POST /webhook.
+
+Levanta los fakes de bench/fakes.py, arranca la app con uvicorn apuntando a
+ellos (SQLite o el fake de Consul con --storage kv; audios en un directorio
+temporal; recordatorios apagados) y reproduce conversaciones firmadas de
+bench/payloads.py con N clientes concurrentes.
+
+Reporta throughput, latencia p50/p95/p99 (total y por tipo de conversación),
+las etapas de /metrics y la contención del storage: tiempo en las etapas de DB
+y errores "database is locked".
+
+Ejemplos (desde la raíz del repo):
+    python -m bench.run --conversations 300 --concurrency 16
+    python -m bench.run --provider openai --llm-latency-ms 800 --out base.json
+    python -m bench.run --out nuevo.json --compare base.json
+
+Los audios son un WAV de 1 s de silencio: si faster-whisper está instalado
+se mide la transcripción real; si no, la rama de fallback.
+
+POST /webhook es `async def` pero hace llamadas bloqueantes, así que cada
+proceso atiende un request por vez. --workers N (4 por defecto) arranca N
+procesos uvicorn en puertos consecutivos desde --port, compartiendo el
+storage; los clientes se reparten entre ellos y /metrics se suma de todos.
+Con --workers 1 el storage nunca recibe accesos concurrentes y la contención
+sale en cero por construcción.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from bench import fakes, payloads
+
+ROOT = Path(__file__).resolve().parent.parent
+SECRET = "bench-secret"
+DB_STAGES = {
+    "upsert_user", "get_state", "set_state", "get_context", "set_context", "log_message", "add_booking",
+    "due_reminders", "claim_reminder", "unclaim_reminder", "pending_reply", "set_booking_status",
+    "get_cursor", "set_cursor", "acquire_lease",
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+
+# ---------- SERVIDOR ----------
+def start_fakes(args) -> dict[str, fakes.FakeService]:
+    llm = dict(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_latency_ms / 4, error_rate=args.error_rate)
+    return {
+        "graph": fakes.GraphFake(latency_ms=args.graph_latency_ms, error_rate=args.error_rate, seed=1).start(),
+        "ollama": fakes.OllamaFake(**llm, seed=2).start(),
+        "openai": fakes.OpenAIFake(**llm, seed=3).start(),
+        "gemini": fakes.GeminiFake(**llm, seed=4).start(),
+        "calendar": fakes.CalendarFake(latency_ms=args.calendar_latency_ms, error_rate=args.error_rate,
+                                       busy_rate=args.busy_rate, seed=5).start(),
+        "consul": fakes.ConsulKVFake(latency_ms=args.kv_latency_ms, seed=6).start(),
+    }
+
+
+def start_app(args, services: dict, tmpdir: str, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WA_APP_SECRET": SECRET,
+        "WA_PHONE_NUMBER_ID": "bench",
+        "WA_ACCESS_TOKEN": "bench",
+        "WA_GRAPH_URL": services["graph"].url,
+        "AI_PROVIDER": args.provider,
+        "OLLAMA_URL": services["ollama"].url,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": services["openai"].url,
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_BASE_URL": services["gemini"].url,
+        "GOOGLE_CALENDAR_API_URL": f"{services['calendar'].url}/calendar/v3/",
+        "STORAGE_BACKEND": args.storage,
+        "KV_URL": services["consul"].url,
+        "DB_PATH": str(Path(tmpdir) / "bench.db"),
+        "AUDIO_TMP_DIR": str(Path(tmpdir) / "audio"),  # no dejar .ogg en el repo
+        "REMINDERS_ENABLED": "false",
+        "SLOW_REQUEST_MS": "0",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn terminó con código {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("uvicorn no respondió en 30 s")
+
+
+# ---------- CARGA ----------
+def drive(args, conversations, ports: list[int]) -> tuple[list[dict], float]:
+    work: queue.Queue = queue.Queue()
+    for conv in conversations:
+        work.put(conv)
+    results: list[dict] = []
+    lock = threading.Lock()
+
+    def client(port: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        local = []
+        while True:
+            try:
+                conv = work.get_nowait()
+            except queue.Empty:
+                break
+            for kind, body, signature in conv:
+                start = time.perf_counter()
+                try:
+                    conn.request("POST", "/webhook", body=body, headers={
+                        "Content-Type": "application/json",
+                        "X-Hub-Signature-256": signature,
+                    })
+                    resp = conn.getresponse()
+                    raw = resp.read()
+                    status = resp.status
+                except OSError as e:
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                    raw, status = json.dumps({"status": "error", "detail": str(e)}).encode(), 0
+                elapsed = time.perf_counter() - start
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    data = {}
+                local.append({"kind": kind, "seconds": elapsed, "http": status,
+                              "status": data.get("status"), "detail": data.get("detail")})
+        conn.close()
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(ports[i % len(ports)],)) for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+# ---------- /metrics ----------
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def scrape_stages(ports: list[int]) -> dict[str, dict]:
+    """Agrega botmuni_stage_seconds por etapa (sumando ramas y workers): count, mean y p95 aproximado."""
+    text = ""
+    for port in ports:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", "/metrics")
+        text += conn.getresponse().read().decode()
+        conn.close()
+    buckets: dict[str, dict[float, float]] = defaultdict(lambda: defaultdict(float))
+    sums: dict[str, float] = defaultdict(float)
+    counts: dict[str, float] = defaultdict(float)
+    for line in text.splitlines():
+        m = _SAMPLE.match(line)
+        if not m or not m.group(1).startswith("botmuni_stage_seconds"):
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', m.group(2)))
+        stage, value = labels["stage"], float(m.group(3))
+        if m.group(1).endswith("_bucket"):
+            buckets[stage][float(labels["le"])] += value
+        elif m.group(1).endswith("_sum"):
+            sums[stage] += value
+        elif m.group(1).endswith("_count"):
+            counts[stage] += value
+    out = {}
+    for stage, count in counts.items():
+        target = 0.95 * count
+        p95 = next((le for le, c in sorted(buckets[stage].items()) if c >= target), float("inf"))
+        out[stage] = {"count": int(count), "mean_ms": sums[stage] / count * 1000 if count else 0.0,
+                      "p95_le_ms": p95 * 1000}
+    return out
+
+
+# ---------- REPORTE ----------
+def build_report(args, results, wall, stages, services) -> dict:
+    by_kind = defaultdict(list)
+    for r in results:
+        by_kind[r["kind"]].append(r["seconds"])
+    errors = defaultdict(int)
+    for r in results:
+        if r["http"] != 200 or r["status"] == "error":
+            errors[r["detail"] or f"http {r['http']}"] += 1
+    db = {k: v for k, v in stages.items() if k in DB_STAGES}
+    db_count = sum(v["count"] for v in db.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in {"out", "compare"}},
+        "requests": len(results),
+        "wall_seconds": wall,
+        "throughput_rps": len(results) / wall if wall else 0.0,
+        "latency": summarize([r["seconds"] for r in results]),
+        "latency_by_kind": {k: summarize(v) for k, v in sorted(by_kind.items())},
+        "errors": dict(errors),
+        "stages": stages,
+        "storage": {
+            "calls": db_count,
+            "mean_ms": sum(v["mean_ms"] * v["count"] for v in db.values()) / db_count if db_count else 0.0,
+            "worst_p95_le_ms": max((v["p95_le_ms"] for v in db.values()), default=0.0),
+            "locked_errors": sum(n for d, n in errors.items() if "locked" in d),
+        },
+        "fake_calls": {name: dict(s.calls) for name, s in services.items() if s.calls},
+    }
+
+
+def print_report(report: dict):
+    lat = report["latency"]
+    print(f"\n{report['requests']} requests en {report['wall_seconds']:.2f}s "
+          f"→ {report['throughput_rps']:.1f} req/s")
+    print(f"latencia  p50 {lat['p50_ms']:.1f}ms  p95 {lat['p95_ms']:.1f}ms  "
+          f"p99 {lat['p99_ms']:.1f}ms  max {lat['max_ms']:.1f}ms")
+    print("\npor tipo de conversación:")
+    for kind, s in report["latency_by_kind"].items():
+        print(f"  {kind:10s} n={s['count']:5d}  p50 {s['p50_ms']:8.1f}ms  p95 {s['p95_ms']:8.1f}ms  p99 {s['p99_ms']:8.1f}ms")
+    print("\netapas (/metrics):")
+    for stage, s in sorted(report["stages"].items(), key=lambda kv: -kv[1]["mean_ms"] * kv[1]["count"]):
+        print(f"  {stage:24s} n={s['count']:5d}  media {s['mean_ms']:8.2f}ms  p95 ≤ {s['p95_le_ms']:g}ms")
+    sq = report["storage"]
+    print(f"\nstorage ({report['config']['storage']}): {sq['calls']} llamadas, media {sq['mean_ms']:.2f}ms, "
+          f"peor p95 ≤ {sq['worst_p95_le_ms']:g}ms, 'database is locked': {sq['locked_errors']}")
+    if report["config"]["workers"] == 1:
+        print("  nota: con --workers 1 cada request corre solo (webhook bloquea el event loop); "
+              "el storage no ve concurrencia y la contención es cero por construcción")
+    if report["errors"]:
+        print("\nerrores:")
+        for detail, n in sorted(report["errors"].items(), key=lambda kv: -kv[1]):
+            print(f"  {n:5d}  {detail}")
+
+
+def print_comparison(base: dict, new: dict):
+    def row(label, a, b, unit, lower_is_better=True):
+        delta = (b - a) / a * 100 if a else 0.0
+        better = (delta < 0) == lower_is_better
+        mark = "" if abs(delta) < 1 else (" ✓" if better else " ✗")
+        print(f"  {label:16s} {a:10.1f}{unit} → {b:10.1f}{unit}  ({delta:+.1f}%){mark}")
+
+    print("\ncomparación contra base:")
+    row("throughput", base["throughput_rps"], new["throughput_rps"], " rps", lower_is_better=False)
+    for p in ("p50_ms", "p95_ms", "p99_ms"):
+        row(p, base["latency"][p], new["latency"][p], "ms")
+    row("storage media", base["storage"]["mean_ms"], new["storage"]["mean_ms"], "ms")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--conversations", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--workers", type=int, default=4,
+                    help="procesos uvicorn (con 1 no hay accesos concurrentes al storage)")
+    ap.add_argument("--port", type=int, default=8765, help="puerto del primer worker")
+    ap.add_argument("--provider", choices=["ollama", "openai", "gemini"], default="ollama")
+    ap.add_argument("--storage", choices=["sqlite", "kv"], default="sqlite",
+                    help="kv usa el fake de Consul (estado compartido entre workers)")
+    ap.add_argument("--mix", default="", help="p. ej. greeting=30,menu=25,booking=20,faq=15,audio=10")
+    ap.add_argument("--llm-latency-ms", type=float, default=200)
+    ap.add_argument("--graph-latency-ms", type=float, default=40)
+    ap.add_argument("--calendar-latency-ms", type=float, default=80)
+    ap.add_argument("--kv-latency-ms", type=float, default=1)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fracción de 500 inyectados en los fakes")
+    ap.add_argument("--busy-rate", type=float, default=0.2, help="fracción de horarios ocupados")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="guardar el reporte en JSON")
+    ap.add_argument("--compare", help="reporte JSON de una corrida anterior")
+    args = ap.parse_args(argv)
+
+    mix = {k: int(v) for k, v in (p.split("=") for p in args.mix.split(",") if p)} or None
+    conversations = payloads.generate(args.conversations, SECRET, mix=mix, seed=args.seed)
+
+    services = start_fakes(args)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ports = [args.port + i for i in range(args.workers)]
+        procs = []
+        try:
+            for port in ports:
+                procs.append(start_app(args, services, tmpdir, port))
+            results, wall = drive(args, conversations, ports)
+            stages = scrape_stages(ports)
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait(timeout=10)
+            for s in services.values():
+                s.stop()
+
+    report = build_report(args, results, wall, stages, services)
+    print_report(report)
+    if args.compare:
+        print_comparison(json.loads(Path(args.compare).read_text(encoding="utf-8")), report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# tests/test_metrics.py
+"""
+app/metrics.py: formato de los histogramas, etiquetado por rama y /metrics.
+"""
+import hashlib
+import hmac
+import logging
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, metrics
+from app.metrics import (
+    BUCKETS, REQUEST_SECONDS, STAGE_SECONDS, Histogram,
+    request_trace, set_branch, span, traced,
+)
+from app.settings import settings
+
+
+def unique(name: str) -> str:
+    # los histogramas son globales: cada test usa sus propias etiquetas
+    return f"{name}_{uuid.uuid4().hex[:6]}"
+
+
+def series(histogram: Histogram, *labels: str) -> tuple[list, float] | None:
+    return histogram._series.get(labels)
+
+
+# ---------- HISTOGRAMAS ----------
+def test_render_buckets_are_cumulative():
+    h = Histogram("t_seconds", "Prueba.", ("stage",))
+    for value in (0.0005, 0.003, 0.003, 0.2, 100):
+        h.observe(value, "x")
+    lines = h.render()
+
+    assert lines[:2] == ["# HELP t_seconds Prueba.", "# TYPE t_seconds histogram"]
+    buckets = {line.split('le="')[1].split('"')[0]: int(line.rsplit(" ", 1)[1])
+               for line in lines if "_bucket" in line}
+    assert list(buckets) == [str(b) for b in BUCKETS] + ["+Inf"]
+    assert buckets["0.001"] == 1
+    assert buckets["0.005"] == 3
+    assert buckets["0.1"] == 3
+    assert buckets["0.25"] == 4
+    assert buckets["60"] == 4
+    assert buckets["+Inf"] == 5
+    counts = list(buckets.values())
+    assert counts == sorted(counts)
+
+    assert 't_seconds_count{stage="x"} 5' in lines
+    total = float(next(line for line in lines if line.startswith("t_seconds_sum")).rsplit(" ", 1)[1])
+    assert total == pytest.approx(100.2065)
+
+
+def test_render_is_sorted_per_label_set():
+    h = Histogram("t_seconds", "Prueba.", ("stage", "branch"))
+    h.observe(0.01, "b", "ai")
+    h.observe(0.01, "a", "ai")
+    counts = [line for line in h.render() if "_count" in line]
+    assert counts == ['t_seconds_count{stage="a",branch="ai"} 1', 't_seconds_count{stage="b",branch="ai"} 1']
+
+
+def test_label_values_are_escaped():
+    assert metrics._escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+    h = Histogram("t_seconds", "Prueba.", ("stage",))
+    h.observe(0.01, 'raro"\n')
+    assert 't_seconds_count{stage="raro\\"\\n"} 1' in h.render()
+
+
+# ---------- TRAZAS ----------
+def test_spans_in_a_trace_take_the_resolved_branch():
+    stage = unique("stage")
+    with request_trace("webhook") as trace:
+        with span(stage):
+            pass
+        set_branch("greeting")
+    assert trace.branch == "greeting"
+    assert sum(series(STAGE_SECONDS, stage, settings.AI_PROVIDER, "greeting")[0]) == 1
+    assert series(STAGE_SECONDS, stage, settings.AI_PROVIDER, "unknown") is None
+
+
+def test_spans_outside_a_trace_are_background():
+    stage = unique("stage")
+
+    @traced(stage)
+    def work():
+        return 42
+
+    assert work() == 42
+    assert sum(series(STAGE_SECONDS, stage, settings.AI_PROVIDER, "background")[0]) == 1
+    set_branch("ignored")  # fuera de un request no hace nada
+
+
+def test_escaping_exception_is_labelled_error_and_logged(caplog):
+    route = unique("route")
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        with pytest.raises(ValueError):
+            with request_trace(route):
+                with span("verify_signature"):
+                    pass
+                raise ValueError("body mal formado")
+    assert series(REQUEST_SECONDS, route, settings.AI_PROVIDER, "error") is not None
+    assert series(REQUEST_SECONDS, route, settings.AI_PROVIDER, "unknown") is None
+    assert "con error" in caplog.text and "verify_signature=" in caplog.text
+
+
+def test_slow_requests_log_their_breakdown(caplog, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 1)
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        with request_trace(unique("route")):
+            with span("chat"):
+                time.sleep(0.005)
+            set_branch("ai")
+    assert "lento" in caplog.text and "[ai]" in caplog.text and "chat=" in caplog.text
+
+
+def test_fast_requests_are_not_logged(caplog, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 10_000)
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        with request_trace(unique("route")):
+            set_branch("ai")
+    assert caplog.text == ""
+
+
+def test_span_overhead_is_microseconds():
+    @traced(unique("noop"))
+    def noop():
+        pass
+
+    n = 20_000
+    with request_trace(unique("route")):
+        start = time.perf_counter()
+        for _ in range(n):
+            noop()
+        per_call = (time.perf_counter() - start) / n
+    # ~2 µs por llamada en una máquina de desarrollo; margen amplio para CI lentos
+    assert per_call < 50e-6
+
+
+# ---------- /metrics ----------
+def test_metrics_endpoint_exposes_webhook_branches(monkeypatch):
+    monkeypatch.setattr(settings, "WA_APP_SECRET", "secreto")
+    client = TestClient(main.app, raise_server_exceptions=False)
+
+    body = b"{no es json"
+    signature = "sha256=" + hmac.new(b"secreto", body, hashlib.sha256).hexdigest()
+    r = client.post("/webhook", content=body, headers={"X-Hub-Signature-256": signature})
+    assert r.status_code == 500
+    client.post("/webhook", content=b"{}", headers={"X-Hub-Signature-256": "sha256=mala"})
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    assert "# TYPE botmuni_stage_seconds histogram" in text
+    assert "# TYPE botmuni_request_seconds histogram" in text
+    provider = settings.AI_PROVIDER
+    assert f'botmuni_request_seconds_count{{route="webhook",provider="{provider}",branch="error"}}' in text
+    assert f'botmuni_request_seconds_count{{route="webhook",provider="{provider}",branch="invalid_signature"}}' in text
+    assert f'botmuni_stage_seconds_count{{stage="verify_signature",provider="{provider}",branch="error"}}' in text
@@ -0,0 +1,242 @@
+# tests/test_reminders.py
+"""
+app/reminders.py contra MemoryStorage, con Graph y Calendar reemplazados.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from app import db, main, reminders
+from app.settings import settings
+from app.storage import MemoryStorage, to_utc_ts
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    s = MemoryStorage()
+    db.set_storage(s)
+    monkeypatch.setattr(settings, "REMINDER_LEAD_HOURS", 24)
+    monkeypatch.setattr(settings, "REMINDER_BATCH_SIZE", 50)
+    monkeypatch.setattr(settings, "REMINDER_TEMPLATE", "recordatorio_turno")
+    yield s
+    db.set_storage(None)
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """Respuestas de Graph en orden; registra cada envío."""
+    calls, responses = [], []
+
+    def fake_send(kind):
+        def send(phone, *args):
+            calls.append((kind, phone, *args))
+            response = responses.pop(0) if responses else (200, "{}")
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return send
+
+    monkeypatch.setattr(reminders, "send_text", fake_send("text"))
+    monkeypatch.setattr(reminders, "send_template", fake_send("template"))
+    return calls, responses
+
+
+def booking(storage, phone="111", hours=10, event_id="ev") -> str:
+    """Turno que empieza en `hours`, sacado hace dos días (con anticipación de sobra)."""
+    start = to_utc_ts(datetime.now(timezone.utc) + timedelta(hours=hours))
+    booking_id = storage.add_booking(phone, event_id, start)
+    storage._bookings[booking_id]["created_at"] = to_utc_ts(datetime.now(timezone.utc) - timedelta(days=2))
+    return booking_id
+
+
+def now():
+    return datetime.now(timezone.utc)
+
+
+# ---------- BARRIDO ----------
+def test_next_batch_keeps_cursor_on_full_batch_and_resets_on_partial(storage, monkeypatch):
+    monkeypatch.setattr(settings, "REMINDER_BATCH_SIZE", 2)
+    ids = sorted(booking(storage, hours=h) for h in (5, 6, 7))
+
+    first = reminders.next_batch(now())
+    assert [b["id"] for b in first] == ids[:2]
+    assert storage.get_cursor(reminders.CURSOR) == ids[1]
+
+    second = reminders.next_batch(now())
+    assert [b["id"] for b in second] == ids[2:]
+    assert storage.get_cursor(reminders.CURSOR) is None
+
+
+def test_next_batch_skips_short_notice_and_out_of_window(storage):
+    due = booking(storage, hours=10)
+    booking(storage, hours=30)  # fuera de la ventana de 24 h
+    storage.add_booking("111", "ev", to_utc_ts(now() + timedelta(hours=3)))  # sacado recién
+    assert [b["id"] for b in reminders.next_batch(now())] == [due]
+
+
+# ---------- ENVÍO ----------
+def test_send_reminder_uses_template_and_logs(storage, graph):
+    calls, _ = graph
+    booking_id = booking(storage)
+    b = storage.due_reminders("", "9999", "", 10)[0]
+
+    assert reminders.send_reminder(b) is True
+    kind, phone, name, lang, params = calls[0]
+    assert (kind, phone, name) == ("template", "111", "recordatorio_turno")
+    assert params == reminders.reminder_params(b)
+    assert storage.claim_reminder(booking_id) is False
+    assert storage.get_messages("111")[0]["text"] == reminders.reminder_text(b)
+    assert reminders.send_reminder(b) is False  # ya reclamado: no se reenvía
+    assert len(calls) == 1
+
+
+def test_send_reminder_without_template_sends_text(storage, graph, monkeypatch):
+    monkeypatch.setattr(settings, "REMINDER_TEMPLATE", "")
+    calls, _ = graph
+    booking(storage)
+    b = storage.due_reminders("", "9999", "", 10)[0]
+    assert reminders.send_reminder(b) is True
+    assert calls == [("text", "111", reminders.reminder_text(b))]
+
+
+@pytest.mark.parametrize("failure", [(503, "unavailable"), (429, "rate"), requests.ConnectionError("down")])
+def test_transient_failures_release_the_claim(storage, graph, failure):
+    _, responses = graph
+    booking_id = booking(storage)
+    b = storage.due_reminders("", "9999", "", 10)[0]
+    responses.append(failure)
+
+    with pytest.raises(Exception):
+        reminders.send_reminder(b)
+    assert storage.get_messages("111") == []
+    assert storage.claim_reminder(booking_id) is True  # quedó libre para el próximo barrido
+
+
+def test_permanent_4xx_keeps_the_claim(storage, graph):
+    _, responses = graph
+    booking_id = booking(storage)
+    b = storage.due_reminders("", "9999", "", 10)[0]
+    responses.append((400, "invalid number"))
+
+    assert reminders.send_reminder(b) is True
+    assert storage.get_messages("111") == []
+    assert storage.claim_reminder(booking_id) is False
+
+
+def test_send_batch_paces_failed_sends_too(storage, graph, monkeypatch):
+    _, responses = graph
+    monkeypatch.setattr(settings, "REMINDER_SENDS_PER_SECOND", 2)
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    for h in (5, 6, 7):
+        booking(storage, phone=f"11{h}", hours=h)
+    batch = reminders.next_batch(now())
+    responses.extend([(503, "x"), (400, "x"), (200, "{}")])
+    asyncio.run(reminders.send_batch(batch))
+    assert sleeps == [0.5, 0.5, 0.5]
+
+
+def test_send_batch_without_rate_limit_does_not_sleep(storage, graph, monkeypatch):
+    monkeypatch.setattr(settings, "REMINDER_SENDS_PER_SECOND", 0)
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    booking(storage)
+    asyncio.run(reminders.send_batch(reminders.next_batch(now())))
+    assert sleeps == []
+
+
+def test_scheduler_does_not_sweep_without_the_lease(storage, graph, monkeypatch):
+    calls, _ = graph
+    monkeypatch.setattr(settings, "REMINDER_POLL_SECONDS", 0.01)
+    booking(storage)
+    storage.acquire_lease(reminders.LEASE, "otro-worker", 60)
+
+    async def run_briefly():
+        task = asyncio.create_task(reminders.run_scheduler())
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+    assert calls == []
+
+
+# ---------- RESPUESTAS ----------
+@pytest.mark.parametrize("text,expected", [
+    ("Confirmo!", "confirmo"), ("*cancelo*", "cancelo"), ("  cancelo. ", "cancelo"),
+    ("¡CONFIRMO!", "confirmo"), ("confirmo el turno", None), ("hola", None),
+])
+def test_reminder_reply_parsing(text, expected):
+    assert reminders.reminder_reply(text) == expected
+
+
+@pytest.fixture
+def calendar(monkeypatch):
+    deleted = []
+    monkeypatch.setattr(reminders.calendar_client, "delete_event", deleted.append)
+    return deleted
+
+
+def reminded(storage, **kwargs) -> str:
+    booking_id = booking(storage, **kwargs)
+    storage.claim_reminder(booking_id)
+    return booking_id
+
+
+def test_confirm_marks_attending(storage, calendar):
+    booking_id = reminded(storage)
+    assert "Gracias" in reminders.handle_reminder_reply("111", "Confirmo!")
+    assert storage._bookings[booking_id]["status"] == "attending"
+    assert calendar == []
+
+
+def test_cancel_deletes_event_and_cancels(storage, calendar):
+    booking_id = reminded(storage, event_id="ev-1")
+    assert "cancelamos" in reminders.handle_reminder_reply("111", "*cancelo*")
+    assert storage._bookings[booking_id]["status"] == "cancelled"
+    assert calendar == ["ev-1"]
+
+
+def test_cancel_still_cancels_when_calendar_fails(storage, monkeypatch):
+    def fail(event_id):
+        raise RuntimeError("410 Gone")
+    monkeypatch.setattr(reminders.calendar_client, "delete_event", fail)
+    booking_id = reminded(storage)
+    assert "cancelamos" in reminders.handle_reminder_reply("111", "cancelo")
+    assert storage._bookings[booking_id]["status"] == "cancelled"
+
+
+def test_reply_without_pending_reminder_falls_through(storage, calendar):
+    booking(storage)  # sin recordatorio enviado
+    assert reminders.handle_reminder_reply("111", "confirmo") is None
+    assert reminders.handle_reminder_reply("222", "confirmo") is None
+    assert reminders.handle_reminder_reply("111", "hola") is None
+
+
+# ---------- WEBHOOK ----------
+def test_webhook_answers_reminder_reply_without_router(storage, calendar, monkeypatch):
+    sent = []
+    monkeypatch.setattr(settings, "WA_APP_SECRET", "")
+    monkeypatch.setattr(main, "send_text", lambda phone, text: sent.append((phone, text)) or (200, "{}"))
+    monkeypatch.setattr(main, "chat", lambda *a, **k: pytest.fail("no tiene que llegar a la IA"))
+    booking_id = reminded(storage)
+
+    body = {"entry": [{"changes": [{"value": {"messages": [
+        {"from": "111", "type": "text", "text": {"body": "Confirmo!"}},
+    ]}}]}]}
+    r = TestClient(main.app).post("/webhook", json=body)
+
+    assert r.json() == {"status": "ok"}
+    assert storage._bookings[booking_id]["status"] == "attending"
+    assert sent == [("111", "¡Gracias por confirmar! Te esperamos 😊")]
+    assert [m["direction"] for m in storage.get_messages("111")] == ["in", "out"]
@@ -0,0 +1,201 @@
+# tests/test_storage.py
+"""
+Contrato de app/storage.py: todo backend tiene que pasar estos tests.
+KVStorage corre contra el fake de Consul de bench/fakes.py.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.storage import KVStorage, MemoryStorage, SQLiteStorage, Storage
+from bench.fakes import ConsulKVFake
+
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def ts(hours: float) -> str:
+    return (datetime.utcnow() + timedelta(hours=hours)).strftime(TS_FORMAT)
+
+
+@pytest.fixture(scope="session")
+def consul():
+    fake = ConsulKVFake().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture(params=["sqlite", "memory", "kv"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        s = SQLiteStorage(tmp_path / "bot.db")
+    elif request.param == "memory":
+        s = MemoryStorage()
+    else:
+        # un prefijo por test aísla los datos dentro del mismo fake
+        s = KVStorage(request.getfixturevalue("consul").url, prefix=f"test-{uuid.uuid4().hex[:8]}")
+    s.init()
+    return s
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class Incomplete(Storage):
+        def upsert_user(self, phone):
+            pass
+
+    with pytest.raises(TypeError, match="unclaim_reminder"):
+        Incomplete()
+
+
+# ---------- USUARIOS ----------
+def test_unknown_phone_is_idle_and_updates_are_noops(storage):
+    storage.set_state("111", "booking")
+    storage.set_context("111", {"a": 1})
+    assert storage.get_state("111") == "idle"
+    assert storage.get_context("111") == {}
+
+
+def test_state_and_context_round_trip(storage):
+    storage.upsert_user("111")
+    assert storage.get_state("111") == "idle"
+    assert storage.get_context("111") == {}
+
+    ctx = {"nombre": "Ñandú Pérez", "alts": ["2026-03-01T10:00:00", "2026-03-01T10:30:00"], "nota": "📅 mañana"}
+    storage.set_state("111", "waiting_alt")
+    storage.set_context("111", ctx)
+    storage.upsert_user("111")  # volver a ver al usuario no pisa el estado
+    assert storage.get_state("111") == "waiting_alt"
+    assert storage.get_context("111") == ctx
+
+    storage.set_context("111", {})
+    assert storage.get_context("111") == {}
+
+
+def test_context_is_not_shared_with_caller(storage):
+    storage.upsert_user("111")
+    ctx = {"alts": ["x"]}
+    storage.set_context("111", ctx)
+    ctx["alts"].append("y")
+    storage.get_context("111")["alts"].append("z")
+    assert storage.get_context("111") == {"alts": ["x"]}
+
+
+def test_messages_keep_order_per_phone(storage):
+    storage.log_message("111", "in", "hola")
+    storage.log_message("222", "in", "otro")
+    storage.log_message("111", "out", "¡Hola! Elegí una opción")
+    storage.log_message("111", "in", "1")
+
+    msgs = storage.get_messages("111")
+    assert [(m["direction"], m["text"]) for m in msgs] == [
+        ("in", "hola"), ("out", "¡Hola! Elegí una opción"), ("in", "1"),
+    ]
+    assert all(m["ts"] for m in msgs)
+    assert [m["text"] for m in storage.get_messages("222")] == ["otro"]
+    assert storage.get_messages("333") == []
+
+
+# ---------- TURNOS ----------
+def test_booking_window_bounds_are_inclusive(storage):
+    start_from, start_to = ts(48), ts(72)
+    before = storage.add_booking("111", "ev-before", ts(47))
+    first = storage.add_booking("111", "ev-first", start_from)
+    last = storage.add_booking("111", "ev-last", start_to)
+    after = storage.add_booking("111", "ev-after", ts(73))
+
+    due = storage.due_reminders(start_from, start_to, "", 10)
+    ids = [b["id"] for b in due]
+    assert ids == [first, last]
+    assert before not in ids and after not in ids
+    assert due[0]["phone"] == "111"
+    assert due[0]["event_id"] == "ev-first"
+    assert due[0]["start_ts"] == start_from
+    assert due[0]["status"] == "booked"
+    assert due[0]["reminded"] is False
+
+
+def test_short_notice_bookings_are_skipped(storage):
+    short = storage.add_booking("111", "ev-short", ts(2))
+    long = storage.add_booking("111", "ev-long", ts(30))
+    ids = [b["id"] for b in storage.due_reminders(ts(0), ts(48), "", 10, min_notice_seconds=24 * 3600)]
+    assert ids == [long]
+    assert short in [b["id"] for b in storage.due_reminders(ts(0), ts(48), "", 10)]
+
+
+def test_cancelled_bookings_are_not_due(storage):
+    booking_id = storage.add_booking("111", "ev", ts(30))
+    storage.set_booking_status(booking_id, "cancelled")
+    assert storage.due_reminders(ts(0), ts(48), "", 10) == []
+
+
+def test_cursor_paging_visits_every_booking_once(storage):
+    expected = sorted(storage.add_booking(f"11{i}", f"ev{i}", ts(30 + i)) for i in range(5))
+    seen, after = [], ""
+    while True:
+        page = storage.due_reminders(ts(0), ts(48), after, 2)
+        seen += [b["id"] for b in page]
+        if len(page) < 2:
+            break
+        after = page[-1]["id"]
+    assert seen == expected
+
+
+def test_claim_is_idempotent_and_unclaim_releases(storage):
+    booking_id = storage.add_booking("111", "ev", ts(30))
+    assert storage.claim_reminder(booking_id) is True
+    assert storage.claim_reminder(booking_id) is False
+    assert storage.due_reminders(ts(0), ts(48), "", 10) == []
+
+    storage.unclaim_reminder(booking_id)
+    assert [b["id"] for b in storage.due_reminders(ts(0), ts(48), "", 10)] == [booking_id]
+    assert storage.claim_reminder(booking_id) is True
+
+
+def test_pending_reply_is_nearest_reminded_upcoming_booking(storage):
+    past = storage.add_booking("111", "ev-past", ts(1))
+    near = storage.add_booking("111", "ev-near", ts(30))
+    far = storage.add_booking("111", "ev-far", ts(40))
+    storage.add_booking("111", "ev-not-reminded", ts(20))
+    assert storage.pending_reply("111", ts(0)) is None
+
+    for booking_id in (past, near, far):
+        storage.claim_reminder(booking_id)
+    # past ya empezó cuando el usuario responde
+    reply = storage.pending_reply("111", ts(2))
+    assert reply["id"] == near
+    assert reply["event_id"] == "ev-near"
+    assert reply["reminded"] is True
+
+    storage.set_booking_status(near, "cancelled")
+    assert storage.pending_reply("111", ts(2))["id"] == far
+    storage.set_booking_status(far, "attending")
+    assert storage.pending_reply("111", ts(2)) is None
+    assert storage.pending_reply("222", ts(0)) is None
+
+
+# ---------- CURSORES ----------
+def test_cursor_set_get_and_delete(storage):
+    assert storage.get_cursor("reminders") is None
+    storage.set_cursor("reminders", "2026-03-01T10:00:00-abc")
+    assert storage.get_cursor("reminders") == "2026-03-01T10:00:00-abc"
+    storage.set_cursor("reminders", "2026-03-02T10:00:00-def")
+    assert storage.get_cursor("reminders") == "2026-03-02T10:00:00-def"
+    assert storage.get_cursor("otro") is None
+
+    storage.set_cursor("reminders", None)
+    assert storage.get_cursor("reminders") is None
+
+
+def test_deleting_missing_cursor_is_noop(storage):
+    storage.set_cursor("nunca-existio", None)
+    assert storage.get_cursor("nunca-existio") is None
+
+
+# ---------- LEASES ----------
+def test_lease_is_exclusive_until_it_expires(storage):
+    assert storage.acquire_lease("reminders", "a", 60) is True
+    assert storage.acquire_lease("reminders", "b", 60) is False
+    assert storage.acquire_lease("reminders", "a", -1) is True  # el dueño renueva (acá, ya vencido)
+    assert storage.acquire_lease("reminders", "b", 60) is True
+    assert storage.acquire_lease("reminders", "a", 60) is False
+    assert storage.acquire_lease("otro", "a", 60) is True